@@ -4,14 +4,20 @@ import redis
 import duckdb
 import datetime
 import json
+import hashlib
 import logging
+import math
 import os
+import sys
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from loaders import db_lock, source_table
 
 logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../Logs')
 data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../Data')
+state_dir = os.path.join(data_dir, 'ingest')
 os.makedirs(logs_dir, exist_ok=True)
 os.makedirs(data_dir, exist_ok=True)
+os.makedirs(state_dir, exist_ok=True)
 log_file_path = os.path.join(logs_dir, f'sentiment_{datetime.datetime.now().strftime("%Y%m%d")}.log')
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', 
                     handlers=[logging.StreamHandler(), logging.FileHandler(log_file_path)])
@@ -25,19 +31,45 @@ TWITTER_API_SECRET = "your_twitter_api_secret"
 TWITTER_ACCESS_TOKEN = "your_twitter_access_token"
 TWITTER_ACCESS_SECRET = "your_twitter_access_secret"
 
+INCREMENTAL_PAGE_SIZE = 100
+MAX_INCREMENTAL_PAGES = 5
+SEEN_FILTER_CAPACITY = 100000
+SEEN_FILTER_ERROR_RATE = 0.001
+
+_news_client = None
+_twitter_api = None
+
 def get_db_path(symbol: str) -> str:
     sanitized_symbol = symbol.replace("NSE:", "").replace(":", "_").replace("-", "_")
     return os.path.join(data_dir, f"{sanitized_symbol}.db")
 
+def get_state_path(symbol: str, suffix: str) -> str:
+    return os.path.join(state_dir, os.path.splitext(os.path.basename(get_db_path(symbol)))[0] + suffix)
+
+def get_news_client():
+    global _news_client
+    if _news_client is None:
+        _news_client = newsapi.NewsApiClient(api_key=NEWS_API_KEY)
+    return _news_client
+
+def get_twitter_api():
+    global _twitter_api
+    if _twitter_api is None:
+        auth = tweepy.OAuthHandler(TWITTER_API_KEY, TWITTER_API_SECRET)
+        auth.set_access_token(TWITTER_ACCESS_TOKEN, TWITTER_ACCESS_SECRET)
+        _twitter_api = tweepy.API(auth)
+    return _twitter_api
+
 def setup_database(symbol: str):
     db_path = get_db_path(symbol)
-    conn = duckdb.connect(db_path)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS sentiment_data(
-            symbol VARCHAR, fetch_time TIMESTAMP, source VARCHAR, sentiment_score DOUBLE, text VARCHAR
-        )
-    """)
-    conn.close()
+    with db_lock(db_path):
+        conn = duckdb.connect(db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sentiment_data(
+                symbol VARCHAR, fetch_time TIMESTAMP, source VARCHAR, sentiment_score DOUBLE, text VARCHAR
+            )
+        """)
+        conn.close()
 
 def log_to_redis(symbol: str, status: str, message: str, record_count: int = 0):
     log_entry = {
@@ -63,21 +95,223 @@ def store_in_redis(symbol: str, data: dict, data_type: str):
 
 def store_sentiment_in_duckdb(symbol: str, source: str, sentiment_score: float, text: str):
     db_path = get_db_path(symbol)
-    conn = duckdb.connect(db_path)
+    with db_lock(db_path):
+        conn = duckdb.connect(db_path)
+        try:
+            conn.execute("INSERT INTO sentiment_data VALUES(?, ?, ?, ?, ?)", 
+                         (symbol, datetime.datetime.now(), source, sentiment_score, text))
+            return 1
+        except Exception as e:
+            logger.error(f"DuckDB store failed: {str(e)}")
+            return 0
+        finally:
+            conn.close()
+
+def store_sentiments_in_duckdb(symbol: str, source: str, items: list) -> int:
+    db_path = get_db_path(symbol)
+    with db_lock(db_path):
+        conn = duckdb.connect(db_path)
+        try:
+            fetch_time = datetime.datetime.now()
+            conn.executemany("INSERT INTO sentiment_data VALUES(?, ?, ?, ?, ?)",
+                             [(symbol, fetch_time, source, item["sentiment_score"], item["text"]) for item in items])
+            return len(items)
+        except Exception as e:
+            logger.error(f"DuckDB store failed: {str(e)}")
+            return 0
+        finally:
+            conn.close()
+
+def load_cursors(symbol: str) -> dict:
+    path = get_state_path(symbol, "_cursors.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_cursors(symbol: str, cursors: dict):
+    path = get_state_path(symbol, "_cursors.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(cursors, f)
+    os.replace(path + ".tmp", path)
+
+class SeenFilter:
+    """
+    Bloom filter of already-ingested item keys, persisted per symbol as [count][current][previous].
+    Once `capacity` keys land in the current generation it becomes the previous one and a fresh one
+    starts, so the false-positive rate stays near `error_rate` however long ingestion runs. Keys two
+    generations old are forgotten, by then the per-source cursors no longer reach back to them.
+    """
+
+    def __init__(self, path: str, capacity: int = SEEN_FILTER_CAPACITY, error_rate: float = SEEN_FILTER_ERROR_RATE):
+        self.path = path
+        self.capacity = capacity
+        self.n_bits = int(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self.size = (self.n_bits + 7) // 8
+        self.count = 0
+        self.current = bytearray(self.size)
+        self.previous = bytearray(self.size)
+        self.loaded = os.path.exists(path) and os.path.getsize(path) == 8 + 2 * self.size
+        if self.loaded:
+            with open(path, "rb") as f:
+                data = f.read()
+            self.count = int.from_bytes(data[:8], "little")
+            self.current = bytearray(data[8:8 + self.size])
+            self.previous = bytearray(data[8 + self.size:])
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def __contains__(self, key: str) -> bool:
+        positions = self._positions(key)
+        return any(all(bits[p >> 3] & (1 << (p & 7)) for p in positions) for bits in (self.current, self.previous))
+
+    def add(self, key: str):
+        if self.count >= self.capacity:
+            logger.info(f"Seen filter {os.path.basename(self.path)} reached {self.capacity} keys, rotating")
+            self.previous, self.current, self.count = self.current, bytearray(self.size), 0
+        for p in self._positions(key):
+            self.current[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def save(self):
+        with open(self.path + ".tmp", "wb") as f:
+            f.write(self.count.to_bytes(8, "little") + self.current + self.previous)
+        os.replace(self.path + ".tmp", self.path)
+
+def advance_cursor(cursor: dict, marks: list, exhausted: bool) -> dict:
+    """
+    Cursor state is {"since", "until", "high"} over publishedAt strings or tweet ids. Sources page newest
+    first, so a run that stops at MAX_INCREMENTAL_PAGES before reaching `since` leaves a gap below its
+    oldest item. `until` keeps that gap open for the next run and `since` only moves to the newest item
+    seen ("high") once the gap is drained. Without a `since` there is no lower watermark to backfill to,
+    a first run only fetches the newest pages and starts the cursor from there.
+    """
+    high = max([m for m in marks + [cursor.get("high"), cursor.get("since")] if m is not None], default=None)
+    if exhausted or not marks or cursor.get("since") is None:
+        return {"since": high, "until": None, "high": None}
+    return {"since": cursor.get("since"), "until": min(marks), "high": high}
+
+class NewsSource:
+    """NewsAPI articles published between the cursor's since and until watermarks, both inclusive"""
+    name = "news"
+
+    def fetch(self, symbol: str, cursor: dict):
+        params = {"q": symbol, "language": "en", "sort_by": "publishedAt", "page_size": INCREMENTAL_PAGE_SIZE}
+        if cursor.get("since"):
+            params["from_param"] = cursor["since"]
+        if cursor.get("until"):
+            params["to"] = cursor["until"]
+        items, exhausted = [], False
+        for page in range(1, MAX_INCREMENTAL_PAGES + 1):
+            try:
+                response = get_news_client().get_everything(page=page, **params)
+            except Exception:
+                # NewsAPI refuses pages past the plan's result limit, resume below what was fetched next run
+                if page == 1:
+                    raise
+                break
+            articles = response.get("articles", [])
+            for article in articles:
+                text = (article.get("title") or "") + " " + (article.get("description") or "")
+                items.append({"id": article.get("url") or text, "text": text, "published_at": article.get("publishedAt")})
+            if len(articles) < INCREMENTAL_PAGE_SIZE or page * INCREMENTAL_PAGE_SIZE >= response.get("totalResults", 0):
+                exhausted = True
+                break
+        marks = [item["published_at"] for item in items if item["published_at"]]
+        return items, advance_cursor(cursor, marks, exhausted)
+
+class TweetSource:
+    """Tweets after the cursor's since_id and, while draining a gap, up to its until id"""
+    name = "tweet"
+
+    def fetch(self, symbol: str, cursor: dict):
+        params = {"q": symbol, "lang": "en", "count": INCREMENTAL_PAGE_SIZE}
+        if cursor.get("since"):
+            params["since_id"] = cursor["since"]
+        if cursor.get("until"):
+            params["max_id"] = cursor["until"] - 1
+        limit = INCREMENTAL_PAGE_SIZE * MAX_INCREMENTAL_PAGES
+        tweets = list(tweepy.Cursor(get_twitter_api().search_tweets, **params).items(limit))
+        items = [{"id": str(tweet.id), "text": tweet.text, "published_at": tweet.created_at.isoformat()} for tweet in tweets]
+        return items, advance_cursor(cursor, [tweet.id for tweet in tweets], len(tweets) < limit)
+
+class FixtureSource:
+    """
+    Local stand-in for the live APIs, reads {symbol: [{"id", "text", "published_at"}, ...]} from a JSON file.
+    Like NewsSource it returns items with since <= published_at <= until, newest first, capped at
+    MAX_INCREMENTAL_PAGES pages of page_size, and leaves boundary repeats to the SeenFilter.
+    """
+
+    def __init__(self, path: str, name: str = "fixture", page_size: int = INCREMENTAL_PAGE_SIZE):
+        self.path = path
+        self.name = name
+        self.page_size = page_size
+
+    def fetch(self, symbol: str, cursor: dict):
+        with open(self.path) as f:
+            items = json.load(f).get(symbol, [])
+        items = [item for item in items
+                 if (not cursor.get("since") or item["published_at"] >= cursor["since"])
+                 and (not cursor.get("until") or item["published_at"] <= cursor["until"])]
+        items.sort(key=lambda item: item["published_at"], reverse=True)
+        limit = self.page_size * MAX_INCREMENTAL_PAGES
+        page = items[:limit]
+        return page, advance_cursor(cursor, [item["published_at"] for item in page], len(items) <= limit)
+
+def text_key(source: str, text: str) -> str:
+    return f"{source}:text:{text}"
+
+def seed_seen_filter(symbol: str, seen: SeenFilter) -> int:
+    """Mark the texts already stored for a symbol seen, so a new filter does not re-store what full fetches kept"""
+    db_path = get_db_path(symbol)
+    with db_lock(db_path):
+        conn = duckdb.connect(db_path, read_only=True)
+        try:
+            table = source_table(conn, "sentiment_data")
+            rows = conn.execute(f"SELECT DISTINCT CAST(source AS VARCHAR), text FROM {table} WHERE text IS NOT NULL").fetchall() if table else []
+        finally:
+            conn.close()
+    for source, text in rows:
+        seen.add(text_key(source, text))
+    logger.info(f"Seeded seen filter for {symbol} with {len(rows)} stored texts")
+    return len(rows)
+
+def ingest_incremental(symbol: str, source, analyzer: SentimentIntensityAnalyzer, seen: SeenFilter, cursors: dict):
+    """Score and store only items the symbol has not seen from this source, then advance its cursor"""
     try:
-        conn.execute("INSERT INTO sentiment_data VALUES(?, ?, ?, ?, ?)", 
-                     (symbol, datetime.datetime.now(), source, sentiment_score, text))
-        return 1
+        items, cursor = source.fetch(symbol, cursors.get(source.name) or {})
+        fresh, keys = [], set()
+        for item in items:
+            # The text key also catches rows stored by full fetches, which kept no item id
+            item_keys = (f"{source.name}:{item['id']}", text_key(source.name, item["text"]))
+            if any(key in seen or key in keys for key in item_keys):
+                continue
+            keys.update(item_keys)
+            fresh.append(item)
+        results = [{"text": item["text"], "sentiment_score": analyzer.polarity_scores(item["text"])["compound"]}
+                   for item in fresh]
+        if results and store_sentiments_in_duckdb(symbol, source.name, results) == 0:
+            log_to_redis(symbol, "ERROR", f"{source.name} sentiment store failed")
+            return []
+        # Only mark items seen and move the cursor once they are stored
+        for key in keys:
+            seen.add(key)
+        cursors[source.name] = cursor
+        store_in_redis(symbol, results, f"{source.name}_sentiment")
+        log_to_redis(symbol, "SUCCESS", f"Fetched {len(results)} new {source.name} sentiments "
+                                        f"({len(items) - len(results)} already seen)", len(results))
+        return results
     except Exception as e:
-        logger.error(f"DuckDB store failed: {str(e)}")
-        return 0
-    finally:
-        conn.close()
+        log_to_redis(symbol, "ERROR", f"Incremental {source.name} sentiment fetch failed: {str(e)}")
+        return []
 
 def fetch_news_sentiment(symbol: str, analyzer: SentimentIntensityAnalyzer):
     try:
-        news_client = newsapi.NewsApiClient(api_key=NEWS_API_KEY)
-        articles = news_client.get_everything(q=symbol, language='en', sort_by='relevancy', page_size=10)
+        articles = get_news_client().get_everything(q=symbol, language='en', sort_by='relevancy', page_size=10)
         results = []
         for article in articles.get("articles", []):
             text = article.get("title", "") + " " + article.get("description", "")
@@ -94,10 +328,7 @@ def fetch_news_sentiment(symbol: str, analyzer: SentimentIntensityAnalyzer):
 
 def fetch_tweet_sentiment(symbol: str, analyzer: SentimentIntensityAnalyzer):
     try:
-        auth = tweepy.OAuthHandler(TWITTER_API_KEY, TWITTER_API_SECRET)
-        auth.set_access_token(TWITTER_ACCESS_TOKEN, TWITTER_ACCESS_SECRET)
-        api = tweepy.API(auth)
-        tweets = tweepy.Cursor(api.search_tweets, q=symbol, lang="en").items(10)
+        tweets = tweepy.Cursor(get_twitter_api().search_tweets, q=symbol, lang="en").items(10)
         results = []
         for tweet in tweets:
             text = tweet.text
@@ -112,33 +343,43 @@ def fetch_tweet_sentiment(symbol: str, analyzer: SentimentIntensityAnalyzer):
         log_to_redis(symbol, "ERROR", f"Tweet sentiment fetch failed: {str(e)}")
         return []
 
-def sentiment_module(symbols=None):
+def sentiment_module(symbols=None, incremental=False, sources=None):
     if symbols is None:
         symbols = ["SBIN.NS", "RELIANCE.NS"]
     elif isinstance(symbols, str):
         symbols = [symbols]
+    if sources is None:
+        sources = [NewsSource(), TweetSource()]
     
     analyzer = SentimentIntensityAnalyzer()
     results = {}
     for symbol in symbols:
         setup_database(symbol)
-        news_sentiment = fetch_news_sentiment(symbol, analyzer)
-        tweet_sentiment = fetch_tweet_sentiment(symbol, analyzer)
-        results[symbol] = {
-            "news_sentiment": news_sentiment,
-            "tweet_sentiment": tweet_sentiment
-        }
-        print(f"\n{symbol} News Sentiment:")
-        for item in news_sentiment:
-            print(f"Text: {item['text'][:50]}... Sentiment: {item['sentiment_score']}")
-        print(f"\n{symbol} Tweet Sentiment:")
-        for item in tweet_sentiment:
-            print(f"Text: {item['text'][:50]}... Sentiment: {item['sentiment_score']}")
+        if incremental:
+            seen = SeenFilter(get_state_path(symbol, "_seen.bloom"))
+            if not seen.loaded:
+                seed_seen_filter(symbol, seen)
+            cursors = load_cursors(symbol)
+            results[symbol] = {
+                f"{source.name}_sentiment": ingest_incremental(symbol, source, analyzer, seen, cursors)
+                for source in sources
+            }
+            seen.save()
+            save_cursors(symbol, cursors)
+        else:
+            results[symbol] = {
+                "news_sentiment": fetch_news_sentiment(symbol, analyzer),
+                "tweet_sentiment": fetch_tweet_sentiment(symbol, analyzer)
+            }
+        for key, items in results[symbol].items():
+            print(f"\n{symbol} {key.replace('_', ' ').title()}:")
+            for item in items:
+                print(f"Text: {item['text'][:50]}... Sentiment: {item['sentiment_score']}")
     return results
 
 def main():
     symbols = ["SBIN.NS", "RELIANCE.NS"]
-    sentiment_module(symbols)
+    sentiment_module(symbols, incremental="--incremental" in sys.argv)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,173 @@
+import datetime, itertools, logging, os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Callable
+from loaders import load_candles, load_sentiment
+
+logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../Logs')
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../Data')
+os.makedirs(logs_dir, exist_ok=True)
+os.makedirs(data_dir, exist_ok=True)
+log_file_path = os.path.join(logs_dir, f'backtest_{datetime.datetime.now().strftime("%Y%m%d")}.log')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                    handlers=[logging.StreamHandler(), logging.FileHandler(log_file_path)])
+logger = logging.getLogger(__name__)
+
+# historical.py stores candles under the Fyers symbol, Sentiment.py under the news/twitter query
+DEFAULT_SENTIMENT_SYMBOLS = {
+    "NSE:SBIN-EQ": "SBIN.NS",
+    "NSE:RELIANCE-EQ": "RELIANCE.NS",
+}
+DEFAULT_PARAM_GRID = {
+    "sentiment_threshold": [0.05, 0.1, 0.2, 0.3, 0.5],
+    "lookback": [5, 15, 30, 60, 120],
+}
+SENTIMENT_MAX_AGE_SECONDS = 6 * 3600
+TRADING_DAYS_PER_YEAR = 252
+IST_OFFSET_SECONDS = 19800
+# Per-process budget for one chunk of grid combinations, at roughly the bytes held per combination per bar
+GRID_CHUNK_BYTES = 128 * 1024 ** 2
+BYTES_PER_COMBO_BAR = 48
+
+def asof_join(left_ts: np.ndarray, right_ts: np.ndarray, right_values: np.ndarray, max_age: int = None) -> np.ndarray:
+    """Latest right value known at or before each left timestamp, NaN when none (or older than max_age)"""
+    joined = np.full(len(left_ts), np.nan)
+    if len(right_ts) == 0:
+        return joined
+    idx = np.searchsorted(right_ts, left_ts, side="right") - 1
+    valid = idx >= 0
+    if max_age is not None:
+        valid &= (left_ts - right_ts[np.maximum(idx, 0)]) <= max_age
+    joined[valid] = right_values[idx[valid]]
+    return joined
+
+def sentiment_momentum_rule(features: Dict[str, np.ndarray], params: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Sentiment-confirmed momentum. Long when sentiment >= threshold and the lookback return is positive,
+    short when sentiment <= -threshold and it is negative. Returns signals shape (k, bars) for k combinations.
+    """
+    log_close = np.log(features["close"])
+    lookback = np.asarray(params["lookback"])[:, None]
+    threshold = np.asarray(params["sentiment_threshold"], dtype=np.float64)[:, None]
+    start = np.arange(len(log_close))[None, :] - lookback
+    momentum = np.where(start >= 0, log_close[None, :] - log_close[np.maximum(start, 0)], np.nan)
+    score = features["sentiment"][None, :]
+    with np.errstate(invalid="ignore"):
+        return ((score >= threshold) & (momentum > 0)).astype(np.int8) - \
+               ((score <= -threshold) & (momentum < 0)).astype(np.int8)
+
+def signal_metrics(signal: np.ndarray, bar_returns: np.ndarray, cost_bps: float, periods_per_year: float) -> Dict[str, np.ndarray]:
+    """Reduce signals shape (k, bars) to per-row metrics, each shape (k,)"""
+    # Signal on bar t is traded on bar t+1
+    position = np.zeros_like(signal)
+    position[:, 1:] = signal[:, :-1]
+    turnover = np.abs(np.diff(position, axis=-1, prepend=0))
+    pnl = position * bar_returns - turnover * (cost_bps / 10000)
+    std = pnl.std(axis=-1)
+    sharpe = np.divide(pnl.mean(axis=-1), std, out=np.zeros_like(std), where=std > 0) * np.sqrt(periods_per_year)
+    equity = np.cumsum(pnl, axis=-1, out=pnl)
+    drawdown = np.maximum.accumulate(equity, axis=-1)
+    drawdown -= equity
+    return {
+        "total_return": equity[:, -1],
+        "sharpe": sharpe,
+        "max_drawdown": drawdown.max(axis=-1),
+        "trades": turnover.sum(axis=-1),
+        "exposure": np.abs(position).mean(axis=-1),
+    }
+
+def evaluate_grid(features: Dict[str, np.ndarray], rule: Callable, param_grid: Dict[str, List[Any]],
+                  cost_bps: float = 1.0, periods_per_year: float = TRADING_DAYS_PER_YEAR * 375) -> List[Dict[str, Any]]:
+    """
+    Evaluate a vectorized signal rule over every combination in param_grid. The rule gets the aligned
+    feature arrays and a chunk of combinations as {param: array(k)} and returns signals shape (k, bars).
+    Combinations are processed in chunks sized to GRID_CHUNK_BYTES so peak memory stays flat as the grid grows.
+    """
+    close = features["close"]
+    bar_returns = np.zeros(len(close))
+    bar_returns[1:] = np.diff(np.log(close))
+    names = list(param_grid)
+    combos = list(itertools.product(*(param_grid[name] for name in names)))
+    chunk = max(1, GRID_CHUNK_BYTES // (BYTES_PER_COMBO_BAR * max(len(close), 1)))
+
+    results = []
+    for offset in range(0, len(combos), chunk):
+        block = combos[offset:offset + chunk]
+        params = {name: np.array([combo[i] for combo in block]) for i, name in enumerate(names)}
+        metrics = signal_metrics(rule(features, params), bar_returns, cost_bps, periods_per_year)
+        for k, combo in enumerate(block):
+            results.append({**dict(zip(names, combo)), **{name: float(values[k]) for name, values in metrics.items()}})
+    return results
+
+def annualization_factor(timestamps: np.ndarray) -> float:
+    """Bars per NSE session times sessions per year, so intraday and 1D bars annualize alike"""
+    sessions = len(np.unique((timestamps + IST_OFFSET_SECONDS) // 86400))
+    return len(timestamps) / max(sessions, 1) * TRADING_DAYS_PER_YEAR
+
+def build_features(symbol: str, sentiment_symbol: str, feature_sources: Dict[str, Any] = None) -> Dict[str, np.ndarray]:
+    """
+    Candles plus every feature as-of joined onto the candle timestamps. feature_sources maps a feature
+    name to (loader, max_age), where loader(symbol) returns {"timestamp", "value"} arrays sorted by timestamp.
+    """
+    candles = load_candles(symbol)
+    features = {"timestamp": candles["timestamp"], "close": candles["close"]}
+    sentiment = load_sentiment(sentiment_symbol)
+    features["sentiment"] = asof_join(candles["timestamp"], sentiment["timestamp"], sentiment["sentiment_score"],
+                                      max_age=SENTIMENT_MAX_AGE_SECONDS)
+    for name, (loader, max_age) in (feature_sources or {}).items():
+        data = loader(symbol)
+        features[name] = asof_join(candles["timestamp"], data["timestamp"], data["value"], max_age=max_age)
+    return features
+
+def backtest_symbol(symbol: str, sentiment_symbol: str, param_grid: Dict[str, List[Any]], cost_bps: float,
+                    rule: Callable = sentiment_momentum_rule, feature_sources: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    features = build_features(symbol, sentiment_symbol, feature_sources)
+    if len(features["timestamp"]) < 2:
+        logger.warning(f"{symbol}: not enough candles to backtest")
+        return []
+    results = evaluate_grid(features, rule, param_grid, cost_bps=cost_bps,
+                            periods_per_year=annualization_factor(features["timestamp"]))
+    for row in results:
+        row["symbol"] = symbol
+    logger.info(f"{symbol}: evaluated {len(results)} parameter sets over {len(features['timestamp'])} bars")
+    return results
+
+def run_backtest(symbols=None, param_grid=None, cost_bps=1.0, sentiment_symbols=None, max_workers=None,
+                 rule=sentiment_momentum_rule, feature_sources=None):
+    if symbols is None:
+        symbols = ["NSE:SBIN-EQ", "NSE:RELIANCE-EQ", "NSE:NIFTY25MAYFUT"]
+    elif isinstance(symbols, str):
+        symbols = [symbols]
+    if param_grid is None:
+        param_grid = DEFAULT_PARAM_GRID
+    if sentiment_symbols is None:
+        sentiment_symbols = DEFAULT_SENTIMENT_SYMBOLS
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            symbol: executor.submit(backtest_symbol, symbol, sentiment_symbols.get(symbol, symbol), param_grid, cost_bps,
+                                    rule, feature_sources)
+            for symbol in symbols
+        }
+        for symbol, future in futures.items():
+            try:
+                results[symbol] = future.result()
+            except Exception as e:
+                logger.error(f"{symbol}: backtest failed: {str(e)}")
+                results[symbol] = []
+    return results
+
+def main():
+    symbols = ["NSE:SBIN-EQ", "NSE:RELIANCE-EQ", "NSE:NIFTY25MAYFUT"]
+    results = run_backtest(symbols)
+    for symbol, rows in results.items():
+        if not rows:
+            print(f"{symbol}: no data")
+            continue
+        best = max(rows, key=lambda row: row["sharpe"])
+        params = " ".join(f"{name}={best[name]}" for name in DEFAULT_PARAM_GRID)
+        print(f"{symbol}: best {params} sharpe={best['sharpe']:.2f} return={best['total_return']:.4f} trades={best['trades']:.0f}")
+
+if __name__ == "__main__":
+    main()
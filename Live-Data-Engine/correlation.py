@@ -0,0 +1,205 @@
+import datetime, logging, os
+import numpy as np
+from typing import Dict, List
+from loaders import load_candles
+
+logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../Logs')
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../Data')
+os.makedirs(logs_dir, exist_ok=True)
+os.makedirs(data_dir, exist_ok=True)
+log_file_path = os.path.join(logs_dir, f'correlation_{datetime.datetime.now().strftime("%Y%m%d")}.log')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                    handlers=[logging.StreamHandler(), logging.FileHandler(log_file_path)])
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOWS = (60, 375)
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """Carry the last known value down each column, leading gaps stay NaN"""
+    rows = np.where(np.isnan(matrix), 0, np.arange(len(matrix))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+def load_close_matrix(symbols: List[str]):
+    """Closes for every symbol on the union of their timestamps, shape (timestamps, symbols), forward filled"""
+    series = [load_candles(symbol) for symbol in symbols]
+    timestamps = np.unique(np.concatenate([s["timestamp"] for s in series])) if series else np.empty(0, dtype=np.int64)
+    closes = np.full((len(timestamps), len(symbols)), np.nan)
+    for j, s in enumerate(series):
+        closes[np.searchsorted(timestamps, s["timestamp"]), j] = s["close"]
+    return timestamps, forward_fill(closes)
+
+class RollingCovariance:
+    """
+    Windowed sums and cross-products of per-bar returns kept in a ring buffer.
+    A validity mask rides along so symbols with no price yet (later listings, leading gaps) are left
+    out of every pair they touch instead of counting as flat. Each append is a rank-1 add and a
+    rank-1 remove on the N x N matrices:
+      cross[i, j]   = sum r_i * r_j        partial[i, j] = sum r_i
+      squares[i, j] = sum r_i ** 2         pairs[i, j]   = bar count
+    all over the bars where both i and j are valid.
+    """
+
+    def __init__(self, n_symbols: int, window: int, recompute_every: int = None):
+        self.window = window
+        self.buffer = np.zeros((window, n_symbols))
+        self.valid = np.zeros((window, n_symbols))
+        self.cross = np.zeros((n_symbols, n_symbols))
+        self.partial = np.zeros((n_symbols, n_symbols))
+        self.squares = np.zeros((n_symbols, n_symbols))
+        self.pairs = np.zeros((n_symbols, n_symbols))
+        self.count = 0
+        self.pos = 0
+        # Add/subtract updates accumulate rounding error, rebuild from the buffer periodically
+        self.recompute_every = recompute_every or window
+        self.updates = 0
+
+    def append(self, returns: np.ndarray, valid: np.ndarray):
+        returns = np.where(valid, returns, 0.0)
+        valid = valid.astype(np.float64)
+        old, old_valid = self.buffer[self.pos], self.valid[self.pos]
+        self.cross += np.outer(returns, returns) - np.outer(old, old)
+        self.partial += np.outer(returns, valid) - np.outer(old, old_valid)
+        self.squares += np.outer(returns ** 2, valid) - np.outer(old ** 2, old_valid)
+        self.pairs += np.outer(valid, valid) - np.outer(old_valid, old_valid)
+        self.buffer[self.pos] = returns
+        self.valid[self.pos] = valid
+        self.pos = (self.pos + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+        self.updates += 1
+        if self.updates >= self.recompute_every:
+            self.recompute()
+
+    def extend(self, returns: np.ndarray, valid: np.ndarray):
+        """Append many bars at once, the last `window` rows replace the state with a single matmul"""
+        if len(returns) < self.window - self.count:
+            for row, row_valid in zip(returns, valid):
+                self.append(row, row_valid)
+            return
+        buffered, buffered_valid = self.ordered()
+        history = np.concatenate([buffered, np.where(valid, returns, 0.0)])[-self.window:]
+        history_valid = np.concatenate([buffered_valid, valid.astype(np.float64)])[-self.window:]
+        self.buffer[:len(history)] = history
+        self.buffer[len(history):] = 0
+        self.valid[:len(history)] = history_valid
+        self.valid[len(history):] = 0
+        self.count = len(history)
+        self.pos = self.count % self.window
+        self.recompute()
+
+    def ordered(self):
+        """Buffered returns and validity, oldest first"""
+        if self.count < self.window:
+            return self.buffer[:self.count].copy(), self.valid[:self.count].copy()
+        return np.roll(self.buffer, -self.pos, axis=0), np.roll(self.valid, -self.pos, axis=0)
+
+    def recompute(self):
+        self.cross = self.buffer.T @ self.buffer
+        self.partial = self.buffer.T @ self.valid
+        self.squares = (self.buffer ** 2).T @ self.valid
+        self.pairs = self.valid.T @ self.valid
+        self.updates = 0
+
+    def pairwise_variance(self) -> np.ndarray:
+        """[i, j] is the variance of i over the bars where j is also valid"""
+        n = self.pairs
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = (self.squares - self.partial ** 2 / n) / (n - 1)
+        return np.where(n >= 2, np.maximum(var, 0), np.nan)
+
+    def covariance(self) -> np.ndarray:
+        n = self.pairs
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = (self.cross - self.partial * self.partial.T / n) / (n - 1)
+        return np.where(n >= 2, cov, np.nan)
+
+    def correlation(self) -> np.ndarray:
+        cov = self.covariance()
+        var = self.pairwise_variance()
+        denom = np.sqrt(var * var.T)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = np.where(denom > 0, cov / denom, np.nan)
+        np.fill_diagonal(corr, np.where(np.diag(var) > 0, 1.0, np.nan))
+        return np.clip(corr, -1.0, 1.0)
+
+    def betas(self, benchmark: int) -> np.ndarray:
+        cov = self.covariance()[:, benchmark]
+        # Benchmark variance over the same bars each symbol is valid on
+        var = self.pairwise_variance()[benchmark, :]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(var > 0, cov / var, np.nan)
+
+class CorrelationEngine:
+    """Rolling covariance, correlation and beta across a symbol universe for several window lengths"""
+
+    def __init__(self, symbols: List[str], windows=DEFAULT_WINDOWS, benchmark: str = None):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.benchmark = benchmark
+        self.windows = {window: RollingCovariance(len(self.symbols), window) for window in windows}
+        self.last_close = np.full(len(self.symbols), np.nan)
+        self.last_timestamp = None
+
+    def returns_from_closes(self, closes: np.ndarray):
+        """Log returns and validity mask for a block of forward-filled closes, invalid before a symbol's first close"""
+        previous = np.vstack([self.last_close, closes[:-1]])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = np.log(closes / previous)
+        self.last_close = np.where(np.isnan(closes[-1]), self.last_close, closes[-1])
+        valid = np.isfinite(returns)
+        return np.where(valid, returns, 0.0), valid
+
+    def append_bar(self, timestamp: int, closes: Dict[str, float]) -> bool:
+        """Push one cross-section of closes, symbols without a new print keep their last close"""
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            logger.warning(f"Ignoring bar at {timestamp}, not after last bar at {self.last_timestamp}")
+            return False
+        row = self.last_close.copy()
+        for symbol, close in closes.items():
+            if symbol in self.index:
+                row[self.index[symbol]] = close
+        returns, valid = self.returns_from_closes(row[None, :])
+        self.last_timestamp = timestamp
+        if not valid.any():
+            return True
+        for rolling in self.windows.values():
+            rolling.append(returns[0], valid[0])
+        return True
+
+    def load(self):
+        """Warm every window from the stored candles"""
+        timestamps, closes = load_close_matrix(self.symbols)
+        if len(timestamps) == 0:
+            logger.warning("No stored candles to warm the correlation engine")
+            return
+        returns, valid = self.returns_from_closes(closes)
+        # Bars before any symbol has two closes carry no information
+        keep = valid.any(axis=1)
+        for rolling in self.windows.values():
+            rolling.extend(returns[keep], valid[keep])
+        self.last_timestamp = int(timestamps[-1])
+        logger.info(f"Loaded {len(timestamps)} bars for {len(self.symbols)} symbols")
+
+    def covariance(self, window: int) -> np.ndarray:
+        return self.windows[window].covariance()
+
+    def correlation(self, window: int) -> np.ndarray:
+        return self.windows[window].correlation()
+
+    def betas(self, window: int, benchmark: str = None) -> Dict[str, float]:
+        benchmark = benchmark or self.benchmark or self.symbols[0]
+        values = self.windows[window].betas(self.index[benchmark])
+        return dict(zip(self.symbols, values.tolist()))
+
+def main():
+    symbols = ["NSE:NIFTY25MAYFUT", "NSE:SBIN-EQ", "NSE:RELIANCE-EQ"]
+    engine = CorrelationEngine(symbols, benchmark="NSE:NIFTY25MAYFUT")
+    engine.load()
+    for window in engine.windows:
+        print(f"\nCorrelation ({window} bars):")
+        print(np.array2string(engine.correlation(window), precision=3, suppress_small=True))
+        for symbol, beta in engine.betas(window).items():
+            print(f"{symbol} beta: {beta:.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from fyers_apiv3 import fyersModel
 import redis, duckdb, datetime, json, logging, os
 from typing import Dict, Any
+from loaders import db_lock
 
 logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../Logs')
 data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../Data')
@@ -28,14 +29,15 @@ def get_db_path(symbol: str) -> str:
 
 def setup_database(symbol: str):
     db_path = get_db_path(symbol)
-    conn = duckdb.connect(db_path)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS stock_data(
-            symbol VARCHAR, timestamp BIGINT, open DOUBLE, high DOUBLE, 
-            low DOUBLE, close DOUBLE, volume BIGINT, oi BIGINT, fetch_time TIMESTAMP
-        )
-    """)
-    conn.close()
+    with db_lock(db_path):
+        conn = duckdb.connect(db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS stock_data(
+                symbol VARCHAR, timestamp BIGINT, open DOUBLE, high DOUBLE, 
+                low DOUBLE, close DOUBLE, volume BIGINT, oi BIGINT
+            )
+        """)
+        conn.close()
 
 def log_to_redis(symbol: str, status: str, message: str, record_count: int = 0):
     log_entry = {
@@ -61,19 +63,21 @@ def store_in_redis(symbol: str, data: Dict[str, Any]):
 
 def store_in_duckdb(symbol: str, candles: list, oi_enabled: bool = False):
     db_path = get_db_path(symbol)
-    conn = duckdb.connect(db_path)
-    try:
-        records = [
-            (symbol, c[0], c[1], c[2], c[3], c[4], c[5], c[6] if oi_enabled and len(c) > 6 else None, datetime.datetime.now())
-            for c in candles
-        ]
-        conn.executemany("INSERT INTO stock_data VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)", records)
-        return len(records)
-    except Exception as e:
-        logger.error(f"DuckDB store failed: {str(e)}")
-        return 0
-    finally:
-        conn.close()
+    with db_lock(db_path):
+        conn = duckdb.connect(db_path)
+        try:
+            records = [
+                (symbol, c[0], c[1], c[2], c[3], c[4], c[5], c[6] if oi_enabled and len(c) > 6 else None)
+                for c in candles
+            ]
+            # Named columns so inserts work on both legacy tables and ones compacted by maintenance.py
+            conn.executemany("INSERT INTO stock_data(symbol, timestamp, open, high, low, close, volume, oi) VALUES(?, ?, ?, ?, ?, ?, ?, ?)", records)
+            return len(records)
+        except Exception as e:
+            logger.error(f"DuckDB store failed: {str(e)}")
+            return 0
+        finally:
+            conn.close()
 
 def is_derivative_symbol(symbol: str) -> bool:
     return "FUT" in symbol or "OPT" in symbol
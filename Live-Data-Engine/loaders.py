@@ -0,0 +1,88 @@
+import duckdb, os, time
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows, no advisory locks
+    fcntl = None
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../Data')
+
+def get_db_path(symbol: str) -> str:
+    sanitized_symbol = symbol.replace("NSE:", "").replace(":", "_").replace("-", "_")
+    return os.path.join(data_dir, f"{sanitized_symbol}.db")
+
+@contextmanager
+def db_lock(db_path: str):
+    """Advisory lock maintenance.py holds while it rebuilds and swaps a DB file, writers hold it around inserts"""
+    if fcntl is None:
+        yield
+        return
+    with open(db_path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def table_exists(conn, table: str) -> bool:
+    return conn.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [table]).fetchone()[0] > 0
+
+def source_table(conn, table: str):
+    """Prefer the <table>_all view maintenance.py creates over live rows plus their Parquet archive"""
+    if table_exists(conn, f"{table}_all"):
+        return f"{table}_all"
+    return table if table_exists(conn, table) else None
+
+def load_candles(symbol: str) -> Dict[str, np.ndarray]:
+    empty = {"timestamp": np.empty(0, dtype=np.int64), "close": np.empty(0, dtype=np.float64)}
+    db_path = get_db_path(symbol)
+    if not os.path.exists(db_path):
+        return empty
+    conn = duckdb.connect(db_path, read_only=True)
+    try:
+        table = source_table(conn, "stock_data")
+        if table is None:
+            return empty
+        # Repeated fetches store the same candle more than once, the latest insert wins as in maintenance.py.
+        # NULLs are dropped in SQL, fetchnumpy returns them as masked arrays that np.asarray would turn into 0.0
+        insert_order = "insert_order" if table.endswith("_all") else "rowid"
+        data = conn.execute(f"""
+            SELECT CAST(timestamp AS BIGINT) AS timestamp, CAST(close AS DOUBLE) AS close FROM {table}
+            WHERE timestamp IS NOT NULL AND close IS NOT NULL
+            QUALIFY row_number() OVER (PARTITION BY timestamp ORDER BY {insert_order} DESC) = 1
+            ORDER BY timestamp
+        """).fetchnumpy()
+        return {"timestamp": np.asarray(data["timestamp"], dtype=np.int64),
+                "close": np.asarray(data["close"], dtype=np.float64)}
+    finally:
+        conn.close()
+
+def load_sentiment(symbol: str) -> Dict[str, np.ndarray]:
+    empty = {"timestamp": np.empty(0, dtype=np.int64), "sentiment_score": np.empty(0, dtype=np.float64)}
+    db_path = get_db_path(symbol)
+    if not os.path.exists(db_path):
+        return empty
+    conn = duckdb.connect(db_path, read_only=True)
+    try:
+        table = source_table(conn, "sentiment_data")
+        if table is None:
+            return empty
+        # Items fetched in the same second are one observation, average them instead of picking one arbitrarily.
+        # NULL scores are dropped so they never mask the previous valid score as 0.0.
+        # Rounding up to the second keeps a score from being known before it was fetched.
+        data = conn.execute(f"""
+            SELECT CAST(ceil(epoch_ms(fetch_time) / 1000) AS BIGINT) AS timestamp, avg(sentiment_score) AS sentiment_score
+            FROM {table} WHERE fetch_time IS NOT NULL AND sentiment_score IS NOT NULL GROUP BY 1 ORDER BY 1
+        """).fetchnumpy()
+    finally:
+        conn.close()
+
+    # fetch_time is a naive local datetime.now() but DuckDB reads it as UTC. Reinterpret it in the local zone
+    # (DST included) so it lines up with the UTC candle epochs.
+    timestamps = np.array([int(time.mktime(time.gmtime(int(ts))[:8] + (-1,))) for ts in data["timestamp"]], dtype=np.int64)
+    order = np.argsort(timestamps, kind="stable")
+    return {"timestamp": timestamps[order],
+            "sentiment_score": np.asarray(data["sentiment_score"], dtype=np.float64)[order]}
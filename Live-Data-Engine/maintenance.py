@@ -0,0 +1,225 @@
+import duckdb, datetime, glob, logging, os
+from typing import Dict, Any
+from loaders import db_lock
+
+logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../Logs')
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../Data')
+archive_dir = os.path.join(data_dir, 'archive')
+os.makedirs(logs_dir, exist_ok=True)
+os.makedirs(data_dir, exist_ok=True)
+log_file_path = os.path.join(logs_dir, f'maintenance_{datetime.datetime.now().strftime("%Y%m%d")}.log')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                    handlers=[logging.StreamHandler(), logging.FileHandler(log_file_path)])
+logger = logging.getLogger(__name__)
+
+# Kept above MAX_MINUTE_DAYS in historical.py so a normal refetch never lands in the archive
+RETENTION_DAYS = 180
+STOCK_COLUMNS = ["symbol", "timestamp", "open", "high", "low", "close", "volume", "oi"]
+SENTIMENT_COLUMNS = ["symbol", "fetch_time", "source", "sentiment_score", "text"]
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+COUNT_COLUMNS = ["volume", "oi"]
+# Archived prices become fixed-point INT32 when every value is an exact 2-decimal price below this bound
+ARCHIVE_PRICE_TYPE = "DECIMAL(9, 2)"
+ARCHIVE_PRICE_MAX = 10 ** 7
+
+def get_archive_dir(db_path: str) -> str:
+    return os.path.join(archive_dir, os.path.splitext(os.path.basename(db_path))[0])
+
+def table_exists(conn, table: str, catalog: str = None) -> bool:
+    query = "SELECT count(*) FROM information_schema.tables WHERE table_name = ?"
+    params = [table]
+    if catalog is not None:
+        query += " AND table_catalog = ?"
+        params.append(catalog)
+    return conn.execute(query, params).fetchone()[0] > 0
+
+def archive_glob(db_path: str, table: str) -> str:
+    return os.path.join(get_archive_dir(db_path), f"{table}_*.parquet")
+
+def archive_columns(conn, table: str, source: str, condition: str) -> str:
+    """
+    Select list for a Parquet archive with the narrowest exact types for the rows being archived.
+    Archives are write-once, so a width only has to fit these rows, never a future insert.
+    """
+    if table == "sentiment_data":
+        return "CAST(symbol AS VARCHAR) AS symbol, fetch_time, source, CAST(sentiment_score AS FLOAT) AS sentiment_score, text"
+    checks = [f"coalesce(bool_and(round({c}, 2) = {c} AND abs({c}) < {ARCHIVE_PRICE_MAX}), true)" for c in PRICE_COLUMNS]
+    checks += [f"coalesce(bool_and({c} BETWEEN 0 AND {2 ** 32 - 1}), true)" for c in COUNT_COLUMNS]
+    row = conn.execute(f"SELECT {', '.join(checks)} FROM {source} WHERE {condition}").fetchone()
+    price_type = ARCHIVE_PRICE_TYPE if all(row[:len(PRICE_COLUMNS)]) else "DOUBLE"
+    columns = ["CAST(symbol AS VARCHAR) AS symbol", "CAST(timestamp AS UINTEGER) AS timestamp"]
+    columns += [f"CAST({c} AS {price_type}) AS {c}" for c in PRICE_COLUMNS]
+    columns += [f"CAST({c} AS {'UINTEGER' if fits else 'BIGINT'}) AS {c}" for c, fits in zip(COUNT_COLUMNS, row[len(PRICE_COLUMNS):])]
+    return ", ".join(columns)
+
+def archive_rows(conn, db_path: str, table: str, source: str, condition: str, key: str) -> int:
+    """Copy matching rows not already archived to a ZSTD Parquet file, returns the row count"""
+    pattern = archive_glob(db_path, table)
+    if glob.glob(pattern):
+        condition += f" AND {key} NOT IN (SELECT {key} FROM read_parquet('{pattern}', union_by_name = true))"
+    count = conn.execute(f"SELECT count(*) FROM {source} WHERE {condition}").fetchone()[0]
+    if count == 0:
+        return 0
+    os.makedirs(get_archive_dir(db_path), exist_ok=True)
+    path = os.path.join(get_archive_dir(db_path), f"{table}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.parquet")
+    columns = archive_columns(conn, table, source, condition)
+    # V2 pages delta-encode the sorted timestamps, with V1 a UINTEGER column writes larger than BIGINT
+    conn.execute(f"COPY (SELECT {columns} FROM {source} WHERE {condition} ORDER BY {key}) TO '{path}' (FORMAT PARQUET, COMPRESSION ZSTD, PARQUET_VERSION V2)")
+    return count
+
+def compact_stock_data(conn, db_path: str, cutoff: datetime.datetime) -> Dict[str, int]:
+    columns = ", ".join(STOCK_COLUMNS)
+    # Later fetches overwrite a still-forming candle, so keep the most recently inserted row
+    conn.execute(f"""
+        CREATE TEMP TABLE stock_dedup AS
+        SELECT {columns} FROM src.stock_data
+        QUALIFY row_number() OVER (PARTITION BY timestamp ORDER BY rowid DESC) = 1
+    """)
+    cutoff_ts = int(cutoff.timestamp())
+    archived = archive_rows(conn, db_path, "stock_data", "stock_dedup", f"timestamp < {cutoff_ts}", "timestamp")
+
+    # Live prices and counts keep the full-width types historical.py inserts so later inserts never round or
+    # overflow. Epoch seconds always fit UINTEGER (until 2106), so that column is narrowed unconditionally.
+    conn.execute("""
+        CREATE TABLE stock_data(
+            symbol symbol_dict, timestamp UINTEGER, open DOUBLE, high DOUBLE,
+            low DOUBLE, close DOUBLE, volume BIGINT, oi BIGINT
+        )
+    """)
+    conn.execute(f"INSERT INTO stock_data SELECT {columns} FROM stock_dedup WHERE timestamp >= {cutoff_ts} ORDER BY timestamp")
+    kept = conn.execute("SELECT count(*) FROM stock_data").fetchone()[0]
+    total = conn.execute("SELECT count(*) FROM src.stock_data").fetchone()[0]
+    conn.execute("DROP TABLE stock_dedup")
+    return {"rows_before": total, "rows_kept": kept, "rows_archived": archived}
+
+def compact_sentiment_data(conn, db_path: str, cutoff: datetime.datetime) -> Dict[str, int]:
+    columns = ", ".join(SENTIMENT_COLUMNS)
+    # The first fetch is when an item became known, later copies are re-fetches of the same item
+    conn.execute(f"""
+        CREATE TEMP TABLE sentiment_dedup AS
+        SELECT {columns} FROM src.sentiment_data
+        QUALIFY row_number() OVER (PARTITION BY source, text ORDER BY fetch_time, rowid) = 1
+    """)
+    cutoff_literal = f"TIMESTAMP '{cutoff.strftime('%Y-%m-%d %H:%M:%S')}'"
+    archived = archive_rows(conn, db_path, "sentiment_data", "sentiment_dedup", f"fetch_time < {cutoff_literal}", "fetch_time")
+
+    conn.execute("""
+        CREATE TABLE sentiment_data(
+            symbol symbol_dict, fetch_time TIMESTAMP, source VARCHAR, sentiment_score DOUBLE, text VARCHAR
+        )
+    """)
+    conn.execute(f"INSERT INTO sentiment_data SELECT {columns} FROM sentiment_dedup WHERE fetch_time >= {cutoff_literal} ORDER BY fetch_time")
+    kept = conn.execute("SELECT count(*) FROM sentiment_data").fetchone()[0]
+    total = conn.execute("SELECT count(*) FROM src.sentiment_data").fetchone()[0]
+    conn.execute("DROP TABLE sentiment_dedup")
+    return {"rows_before": total, "rows_kept": kept, "rows_archived": archived}
+
+def create_archive_views(db_path: str):
+    """
+    <table>_all views union the live table with its Parquet archive so old data stays queryable.
+    insert_order carries the live rowid (archived rows are older, so -1) for latest-insert-wins readers.
+    """
+    conn = duckdb.connect(db_path)
+    try:
+        for table in ("stock_data", "sentiment_data"):
+            if not table_exists(conn, table):
+                continue
+            pattern = archive_glob(db_path, table)
+            archive = f" UNION ALL BY NAME SELECT *, -1 AS insert_order FROM read_parquet('{pattern}', union_by_name = true)" if glob.glob(pattern) else ""
+            conn.execute(f"CREATE OR REPLACE VIEW {table}_all AS SELECT *, rowid AS insert_order FROM {table}{archive}")
+    finally:
+        conn.close()
+
+def compact_database(db_path: str, retention_days: int = RETENTION_DAYS) -> Dict[str, Any]:
+    # Writers in historical.py and Sentiment.py take the same lock, so no insert lands between the
+    # rebuild reading the old file and the swap replacing it
+    with db_lock(db_path):
+        return _compact_database(db_path, retention_days)
+
+def source_row_counts(db_path: str, tables: list) -> Dict[str, int]:
+    conn = duckdb.connect(db_path, read_only=True)
+    try:
+        return {t: conn.execute(f"SELECT count(*) FROM {t}").fetchone()[0] for t in tables}
+    finally:
+        conn.close()
+
+def _compact_database(db_path: str, retention_days: int) -> Dict[str, Any]:
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=retention_days)
+    size_before = os.path.getsize(db_path)
+
+    # Flush any WAL so the read-only attach below sees every row
+    conn = duckdb.connect(db_path)
+    conn.execute("CHECKPOINT")
+    conn.close()
+
+    # Rebuilding into a fresh file is the only way DuckDB hands deleted space back to the filesystem
+    tmp_path = db_path + ".compact"
+    for path in (tmp_path, tmp_path + ".wal"):
+        if os.path.exists(path):
+            os.remove(path)
+    conn = duckdb.connect(tmp_path)
+    try:
+        conn.execute(f"ATTACH '{db_path}' AS src (READ_ONLY)")
+        tables = [t for t in ("stock_data", "sentiment_data") if table_exists(conn, t, catalog="src")]
+        symbols = sorted({row[0] for t in tables for row in
+                          conn.execute(f"SELECT DISTINCT symbol FROM src.{t} WHERE symbol IS NOT NULL").fetchall()})
+        # Per-symbol files hold one symbol, so the ENUM stores a 1-byte code instead of the string on every row
+        if symbols:
+            labels = ", ".join("'" + s.replace("'", "''") + "'" for s in symbols)
+            conn.execute(f"CREATE TYPE symbol_dict AS ENUM ({labels})")
+        else:
+            conn.execute("CREATE TYPE symbol_dict AS VARCHAR")
+        report = {"db_path": db_path, "skipped": not tables}
+        if "stock_data" in tables:
+            report["stock_data"] = compact_stock_data(conn, db_path, cutoff)
+        if "sentiment_data" in tables:
+            report["sentiment_data"] = compact_sentiment_data(conn, db_path, cutoff)
+        conn.execute("DETACH src")
+        conn.execute("CHECKPOINT")
+    except Exception:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+    if report["skipped"]:
+        os.remove(tmp_path)
+        return report
+
+    # Guard against writers that bypass the lock: abort rather than drop rows inserted during the rebuild
+    counts = source_row_counts(db_path, tables)
+    if any(counts[t] != report[t]["rows_before"] for t in tables):
+        os.remove(tmp_path)
+        raise RuntimeError(f"rows were added to {os.path.basename(db_path)} during compaction, not swapping")
+
+    os.replace(tmp_path, db_path)
+    if os.path.exists(db_path + ".wal"):
+        os.remove(db_path + ".wal")
+    create_archive_views(db_path)
+    report["size_before"] = size_before
+    report["size_after"] = os.path.getsize(db_path)
+    return report
+
+def run_maintenance(db_paths=None, retention_days=RETENTION_DAYS):
+    if db_paths is None:
+        db_paths = sorted(glob.glob(os.path.join(data_dir, "*.db")))
+    elif isinstance(db_paths, str):
+        db_paths = [db_paths]
+
+    results = {}
+    for db_path in db_paths:
+        try:
+            report = compact_database(db_path, retention_days)
+            if not report.get("skipped"):
+                logger.info(f"{os.path.basename(db_path)}: {report['size_before']:,} -> {report['size_after']:,} bytes, "
+                            f"stock={report.get('stock_data')} sentiment={report.get('sentiment_data')}")
+            results[db_path] = report
+        except Exception as e:
+            logger.error(f"{os.path.basename(db_path)}: maintenance failed: {str(e)}")
+            results[db_path] = None
+    return results
+
+def main():
+    run_maintenance(retention_days=RETENTION_DAYS)
+
+if __name__ == "__main__":
+    main()
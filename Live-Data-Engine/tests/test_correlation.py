@@ -0,0 +1,77 @@
+import os, sys
+import pytest
+
+for module in ("duckdb", "numpy"):
+    pytest.importorskip(module)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+import correlation
+
+SYMBOLS = ["NSE:NIFTY25MAYFUT", "NSE:SBIN-EQ", "NSE:RELIANCE-EQ"]
+WINDOW = 20
+
+def make_closes(bars=60, seed=7):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.01, size=(bars, len(SYMBOLS)))
+    returns[:, 1] += 0.8 * returns[:, 0]
+    closes = 100 * np.exp(np.cumsum(returns, axis=0))
+    # RELIANCE lists late, inside the last window
+    closes[:bars - WINDOW // 2, 2] = np.nan
+    return closes
+
+def expected(closes):
+    """Covariance and correlation over the last WINDOW returns, each pair on the bars where both are valid"""
+    returns = np.diff(np.log(closes), axis=0)[-WINDOW:]
+    n = len(SYMBOLS)
+    cov, corr = np.full((n, n), np.nan), np.full((n, n), np.nan)
+    for i in range(n):
+        for j in range(n):
+            both = np.isfinite(returns[:, i]) & np.isfinite(returns[:, j])
+            if both.sum() >= 2:
+                cov[i, j] = np.cov(returns[both, i], returns[both, j])[0, 1]
+                corr[i, j] = np.corrcoef(returns[both, i], returns[both, j])[0, 1]
+    return cov, corr
+
+def incremental_engine(closes):
+    engine = correlation.CorrelationEngine(SYMBOLS, windows=(WINDOW,), benchmark=SYMBOLS[0])
+    for t, row in enumerate(closes):
+        engine.append_bar(t, {s: c for s, c in zip(SYMBOLS, row) if not np.isnan(c)})
+    return engine
+
+def bulk_engine(closes):
+    engine = correlation.CorrelationEngine(SYMBOLS, windows=(WINDOW,), benchmark=SYMBOLS[0])
+    returns, valid = engine.returns_from_closes(closes)
+    engine.windows[WINDOW].extend(returns, valid)
+    return engine
+
+@pytest.mark.parametrize("build", [incremental_engine, bulk_engine])
+def test_matches_masked_numpy_with_late_listing(build):
+    closes = make_closes()
+    engine = build(closes)
+    cov, corr = expected(closes)
+
+    np.testing.assert_allclose(engine.covariance(WINDOW), cov, rtol=1e-9, atol=1e-15)
+    np.testing.assert_allclose(engine.correlation(WINDOW), corr, rtol=1e-9)
+    # The late listing's pairs only use its own bars, never leading zeros
+    assert engine.windows[WINDOW].pairs[2, 0] == WINDOW // 2 - 1
+
+    betas = engine.betas(WINDOW)
+    np.testing.assert_allclose(betas[SYMBOLS[1]], cov[1, 0] / cov[0, 0], rtol=1e-9)
+    assert betas[SYMBOLS[0]] == pytest.approx(1.0)
+
+def test_incremental_and_bulk_paths_agree():
+    closes = make_closes(bars=200)
+    incremental, bulk = incremental_engine(closes), bulk_engine(closes)
+    np.testing.assert_allclose(incremental.correlation(WINDOW), bulk.correlation(WINDOW), rtol=1e-9)
+
+def test_stale_and_duplicate_bars_are_rejected():
+    closes = make_closes()
+    engine = incremental_engine(closes)
+    before = engine.covariance(WINDOW)
+    last = len(closes) - 1
+
+    assert engine.append_bar(last, {SYMBOLS[0]: 1.0}) is False
+    assert engine.append_bar(last - 5, {SYMBOLS[0]: 1.0}) is False
+    np.testing.assert_array_equal(engine.covariance(WINDOW), before)
+    assert engine.last_timestamp == last
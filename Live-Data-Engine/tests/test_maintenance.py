@@ -0,0 +1,85 @@
+import datetime, glob, os, sys
+import pytest
+
+for module in ("duckdb", "numpy", "redis", "fyers_apiv3"):
+    pytest.importorskip(module)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import duckdb
+import historical
+import loaders
+import maintenance
+
+SYMBOL = "NSE:SBIN-EQ"
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    for module in (historical, loaders, maintenance):
+        monkeypatch.setattr(module, "data_dir", str(tmp_path))
+    monkeypatch.setattr(maintenance, "archive_dir", str(tmp_path / "archive"))
+    path = loaders.get_db_path(SYMBOL)
+
+    now = int(datetime.datetime.now().timestamp()) // 60 * 60
+    old = now - 200 * 86400
+    conn = duckdb.connect(path)
+    # Legacy layout with the per-row fetch_time
+    conn.execute("""
+        CREATE TABLE stock_data(
+            symbol VARCHAR, timestamp BIGINT, open DOUBLE, high DOUBLE,
+            low DOUBLE, close DOUBLE, volume BIGINT, oi BIGINT, fetch_time TIMESTAMP
+        )
+    """)
+    candles = [(SYMBOL, ts, 100.05, 100.1, 100.0, 100.05, 1000, None, datetime.datetime.now())
+               for ts in list(range(old, old + 600, 60)) + list(range(now - 600, now, 60))]
+    conn.executemany("INSERT INTO stock_data VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)", candles + candles)
+    # A refetch of a still-forming candle, the later insert must win
+    conn.execute("INSERT INTO stock_data VALUES(?, ?, 1, 1, 1, 101.5, 2000, NULL, now())", [SYMBOL, now - 60])
+    conn.execute("CREATE TABLE sentiment_data(symbol VARCHAR, fetch_time TIMESTAMP, source VARCHAR, sentiment_score DOUBLE, text VARCHAR)")
+    conn.executemany("INSERT INTO sentiment_data VALUES(?, now(), 'news', 0.25, ?)", [(SYMBOL, "a"), (SYMBOL, "a"), (SYMBOL, "b")])
+    conn.close()
+    return path
+
+def test_compaction_dedupes_archives_and_keeps_data_queryable(db_path):
+    report = maintenance.compact_database(db_path)
+
+    assert report["stock_data"] == {"rows_before": 41, "rows_kept": 10, "rows_archived": 10}
+    assert report["sentiment_data"]["rows_kept"] == 2
+
+    archives = glob.glob(maintenance.archive_glob(db_path, "stock_data"))
+    assert len(archives) == 1
+    conn = duckdb.connect()
+    types = dict(conn.execute(f"SELECT column_name, column_type FROM (DESCRIBE SELECT * FROM read_parquet('{archives[0]}'))").fetchall())
+    conn.close()
+    assert types["timestamp"] == "UINTEGER" and types["close"] == "DECIMAL(9,2)" and types["volume"] == "UINTEGER"
+
+    candles = loaders.load_candles(SYMBOL)
+    assert len(candles["timestamp"]) == 20
+    assert candles["close"][-1] == 101.5
+    assert candles["close"][0] == 100.05
+
+    # Running again archives nothing new and keeps the same rows
+    again = maintenance.compact_database(db_path)
+    assert again["stock_data"]["rows_archived"] == 0
+    assert len(loaders.load_candles(SYMBOL)["timestamp"]) == 20
+
+def test_historical_inserts_into_compacted_table_without_loss(db_path):
+    maintenance.compact_database(db_path)
+    ts = int(datetime.datetime.now().timestamp()) // 60 * 60 + 60
+
+    assert historical.store_in_duckdb(SYMBOL, [[ts, 83.1234, 83.2, 83.0, 83.1234, 5_000_000_000]]) == 1
+
+    conn = duckdb.connect(db_path, read_only=True)
+    row = conn.execute("SELECT close, volume FROM stock_data WHERE timestamp = ?", [ts]).fetchone()
+    conn.close()
+    assert row == (83.1234, 5_000_000_000)
+    assert loaders.load_candles(SYMBOL)["close"][-1] == 83.1234
+
+def test_compaction_aborts_when_rows_change_underneath(db_path, monkeypatch):
+    monkeypatch.setattr(maintenance, "source_row_counts", lambda path, tables: {t: -1 for t in tables})
+
+    with pytest.raises(RuntimeError):
+        maintenance.compact_database(db_path)
+    conn = duckdb.connect(db_path, read_only=True)
+    assert conn.execute("SELECT count(*) FROM stock_data").fetchone()[0] == 41
+    conn.close()
+    assert not os.path.exists(db_path + ".compact")
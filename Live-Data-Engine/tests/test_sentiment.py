@@ -0,0 +1,114 @@
+import json, os, sys
+import pytest
+
+for module in ("duckdb", "redis", "tweepy", "newsapi", "vaderSentiment"):
+    pytest.importorskip(module)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import duckdb
+import Sentiment
+
+SYMBOL = "SBIN.NS"
+
+class FakeRedis:
+    def hset(self, key, mapping=None):
+        pass
+
+    def set(self, key, value):
+        pass
+
+    def expire(self, key, seconds):
+        pass
+
+@pytest.fixture
+def sentiment_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(Sentiment, "data_dir", str(tmp_path))
+    monkeypatch.setattr(Sentiment, "state_dir", str(tmp_path))
+    monkeypatch.setattr(Sentiment, "redis_client", FakeRedis())
+    return tmp_path
+
+def write_fixture(path, items):
+    with open(path, "w") as f:
+        json.dump({SYMBOL: items}, f)
+
+def stored_rows():
+    conn = duckdb.connect(Sentiment.get_db_path(SYMBOL))
+    try:
+        return conn.execute("SELECT text FROM sentiment_data ORDER BY text").fetchall()
+    finally:
+        conn.close()
+
+def run(source):
+    return Sentiment.sentiment_module(SYMBOL, incremental=True, sources=[source])[SYMBOL]["news_sentiment"]
+
+def test_incremental_run_skips_seen_items_and_advances_cursor(sentiment_env):
+    fixture = sentiment_env / "fixture.json"
+    items = [
+        {"id": "a", "text": "Bank posts record profit", "published_at": "2026-01-01T09:00:00Z"},
+        {"id": "b", "text": "Regulator fines bank", "published_at": "2026-01-01T10:00:00Z"},
+    ]
+    write_fixture(fixture, items)
+    source = Sentiment.FixtureSource(str(fixture), name="news")
+
+    assert len(run(source)) == 2
+    assert Sentiment.load_cursors(SYMBOL)["news"]["since"] == "2026-01-01T10:00:00Z"
+
+    assert run(source) == []
+    assert len(stored_rows()) == 2
+
+    # An item sharing the watermark's timestamp must still be picked up, the filter drops the repeat
+    items += [
+        {"id": "c", "text": "Late article at the watermark", "published_at": "2026-01-01T10:00:00Z"},
+        {"id": "d", "text": "Bank raises deposit rates", "published_at": "2026-01-02T08:00:00Z"},
+    ]
+    write_fixture(fixture, items)
+    assert sorted(item["text"] for item in run(source)) == ["Bank raises deposit rates", "Late article at the watermark"]
+    assert len(stored_rows()) == 4
+    assert Sentiment.load_cursors(SYMBOL)["news"]["since"] == "2026-01-02T08:00:00Z"
+
+def test_capped_run_backfills_gap_on_next_run(sentiment_env, monkeypatch):
+    monkeypatch.setattr(Sentiment, "MAX_INCREMENTAL_PAGES", 1)
+    fixture = sentiment_env / "fixture.json"
+    items = [{"id": str(i), "text": f"Headline {i}", "published_at": f"2026-01-01T{i:02d}:00:00Z"} for i in range(1, 6)]
+    write_fixture(fixture, items)
+    source = Sentiment.FixtureSource(str(fixture), name="news", page_size=2)
+    Sentiment.save_cursors(SYMBOL, {"news": {"since": "2026-01-01T00:00:00Z"}})
+
+    # The inclusive until bound re-fetches one boundary item per run, the filter drops it
+    runs = [len(run(source)) for _ in range(5)]
+    assert runs == [2, 1, 1, 1, 0]
+    assert len(stored_rows()) == 5
+    assert Sentiment.load_cursors(SYMBOL)["news"] == {"since": "2026-01-01T05:00:00Z", "until": None, "high": None}
+
+def test_first_capped_run_starts_from_newest_without_backfill(sentiment_env, monkeypatch):
+    monkeypatch.setattr(Sentiment, "MAX_INCREMENTAL_PAGES", 1)
+    fixture = sentiment_env / "fixture.json"
+    items = [{"id": str(i), "text": f"Headline {i}", "published_at": f"2026-01-01T{i:02d}:00:00Z"} for i in range(5)]
+    write_fixture(fixture, items)
+    source = Sentiment.FixtureSource(str(fixture), name="news", page_size=2)
+
+    assert len(run(source)) == 2
+    assert Sentiment.load_cursors(SYMBOL)["news"] == {"since": "2026-01-01T04:00:00Z", "until": None, "high": None}
+    assert run(source) == []
+
+def test_new_filter_is_seeded_from_stored_rows(sentiment_env):
+    Sentiment.setup_database(SYMBOL)
+    Sentiment.store_sentiment_in_duckdb(SYMBOL, "news", 0.5, "Bank posts record profit")
+    fixture = sentiment_env / "fixture.json"
+    write_fixture(fixture, [
+        {"id": "a", "text": "Bank posts record profit", "published_at": "2026-01-01T09:00:00Z"},
+        {"id": "b", "text": "Regulator fines bank", "published_at": "2026-01-01T10:00:00Z"},
+    ])
+
+    assert [item["text"] for item in run(Sentiment.FixtureSource(str(fixture), name="news"))] == ["Regulator fines bank"]
+    assert stored_rows() == [("Bank posts record profit",), ("Regulator fines bank",)]
+
+def test_seen_filter_rotates_at_capacity(tmp_path):
+    seen = Sentiment.SeenFilter(str(tmp_path / "seen.bloom"), capacity=10, error_rate=0.01)
+    for i in range(25):
+        seen.add(f"k{i}")
+    seen.save()
+
+    reloaded = Sentiment.SeenFilter(str(tmp_path / "seen.bloom"), capacity=10, error_rate=0.01)
+    assert reloaded.count == 5
+    assert all(f"k{i}" in reloaded for i in range(10, 25))